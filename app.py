@@ -15,15 +15,50 @@ Author: Thibault Betremieux
 """
 from __future__ import annotations
 import argparse
+import atexit
 import datetime
+import functools
+import gzip
+import hashlib
 import os
+import shutil
+import sys
+import tempfile
 from dataclasses import dataclass, field as dataclass_field
-from flask import Flask, render_template, request
+from pathlib import Path
+from types import MappingProxyType
+from typing import Callable, Iterator
+from urllib.parse import parse_qs
+from flask import Flask, Response, current_app, render_template, request, url_for
+from flask.helpers import get_debug_flag
+from jinja2 import FileSystemBytecodeCache, ModuleLoader
+from markupsafe import Markup
+from werkzeug.http import is_resource_modified
+
+try:
+    import brotli
+except ImportError:  # optional, see function `compress_page`
+    brotli = None
+
+try:
+    from whitenoise import WhiteNoise
+except ImportError:  # optional, see function `create_app`
+    WhiteNoise = None
 
 
 # region Helpers
 
-@dataclass(frozen=True)
+# with `slots` instances don't carry a __dict__ (only possible as of Python 3.10)
+_DATACLASS_OPTIONS = dict(frozen=True, slots=True) if sys.version_info >= (3, 10) else dict(frozen=True)
+
+
+def _mark_items_safe(self) -> None:
+    # `__post_init__` of the dataclasses with HTML sentences in `items`: mark them as safe
+    # once instead of using the filter "safe" in templates (the dataclasses are frozen)
+    object.__setattr__(self, 'items', tuple(Markup(item) for item in self.items))
+
+
+@dataclass(**_DATACLASS_OPTIONS)
 class ProgressSkill:
     """
     Data for a skill using a bootstrap progress element
@@ -50,7 +85,7 @@ class ProgressSkill:
     color: str = dataclass_field(default='#7f8d63')
 
 
-@dataclass(frozen=True)
+@dataclass(**_DATACLASS_OPTIONS)
 class TextSkill:
     """
     Data for a skill displayed as text in my resume
@@ -60,15 +95,18 @@ class TextSkill:
     title
         A title for the skill e.g. "Data transformation"
     items
-        List of sentences explaining the experience (each sentence
+        Tuple of sentences explaining the experience (each sentence
         will be rendered as HTML <li> element, unless there
-        is only one sentence in which case we use <p>)
+        is only one sentence in which case we use <p>).
+        The sentences may contain HTML (they are marked as safe)
     """
     title: str
-    items: list[str]
+    items: tuple[str, ...]
+
+    __post_init__ = _mark_items_safe
 
 
-@dataclass(frozen=True)
+@dataclass(**_DATACLASS_OPTIONS)
 class Experience:
     """
     Job, internship or study in my resume
@@ -84,9 +122,10 @@ class Experience:
     location
         E.g. city
     items
-        List of sentences explaining the experience (each sentence
+        Tuple of sentences explaining the experience (each sentence
         will be rendered as HTML <li> element, unless there
-        is only one sentence in which case we use <p>)
+        is only one sentence in which case we use <p>).
+        The sentences may contain HTML (they are marked as safe)
     icon_name
         Name of the icon to use on the left of the `label`
         (see folder `static/icons`)
@@ -95,106 +134,143 @@ class Experience:
     name: str
     date_range: str
     location: str
-    items: list[str]
+    items: tuple[str, ...]
     icon_name: str | None = dataclass_field(default=None)
 
+    __post_init__ = _mark_items_safe
 
-def get_extra_files(extra_dirs: list[str]) -> list[str]:
+
+def iter_extra_files(extra_dirs: list[str], extensions: tuple[str, ...] | None = None) -> Iterator[str]:
     """
-    Gets a list of "extra" files to be monitored by flask and reloaded
+    Yields "extra" files to be monitored by flask and reloaded
     on changes when doing live development.
     See https://stackoverflow.com/a/9511655/10551772
 
+    Parameters
+    ----------
+    extra_dirs
+        Directories to look for files in (recursively)
+    extensions
+        Optionally, only keep files with these extensions e.g. `('.html', '.css')`
+
     Examples
     --------
-    >>> get_extra_files(extra_dirs=['./static', './templates'])  # doctest: +ELLIPSIS
+    >>> list(iter_extra_files(extra_dirs=['./static', './templates']))  # doctest: +ELLIPSIS
     ['./static', './templates', ..., './static/icons/FR.svg', ..., './templates/index.html', ...]
+    >>> list(iter_extra_files(extra_dirs=['./templates'], extensions=('.css',)))
+    ['./templates']
+    >>> files = list(iter_extra_files(extra_dirs=['./static/icons', './static']))
+    >>> len(files) == len(set(files))
+    True
     """
-    extra_files = extra_dirs[:]
+    yield from extra_dirs
+    # directories we already went through (in case `extra_dirs` overlap) so files are only yielded once
+    scanned = set()
     for extra_dir in extra_dirs:
-        for dirname, dirs, files in os.walk(extra_dir):
-            for filename in files:
-                filename = os.path.join(dirname, filename)
-                if os.path.isfile(filename):
-                    extra_files.append(filename)
-    return extra_files
+        # os.scandir gives us the type of each entry without extra stat calls
+        to_scan = [extra_dir]
+        while to_scan:
+            folder = to_scan.pop()
+            if os.path.normpath(folder) in scanned:
+                continue
+            scanned.add(os.path.normpath(folder))
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        to_scan.append(entry.path)
+                    elif entry.is_file() and (extensions is None or entry.name.endswith(extensions)):
+                        yield entry.path
+
+
+def get_static_version(static_dir: str) -> str:
+    """
+    Gets a version for the static files (modification time of the most
+    recently modified file) that we append to their URLs. This way browsers
+    can cache them for a long time and still get new versions on deploys.
+
+    Examples
+    --------
+    >>> get_static_version('./static')  # doctest: +SKIP
+    '1710106929'
+    """
+    return str(int(max(os.path.getmtime(filepath) for filepath in iter_extra_files([static_dir]))))
 
 
 # endregion Helpers
 
 # region Data
 
-# Encoded email to avoid spam
-# See http://hcard.geekhood.net/encode/
-ENCODED_EMAIL = ('t&#x68;&#x69;ba&#x75;l&#x74;&#x2E;&#98;etr&#x65;&#x6d;i&#101;&#x75;x&#x40;&#x67;&#x6D;ail&#46;'
-                 '&#x63;&#111;&#x6D;')
+# Email encoded with base64 to avoid spam, it is decoded in the browser by static/js/email.js
+ENCODED_EMAIL = 'dGhpYmF1bHQuYmV0cmVtaWV1eEBnbWFpbC5jb20='
 
 # variables sorted as they appear in the web page (from top to bottom or left to right if in the same container)
+# note: no need to intern repeated strings (e.g. locations), the compiler already merges identical
+# string constants of this module so they all point to the same object
 
 # region Progress skills
 
-languages = [ProgressSkill(label='Französisch', progress=100, icon_name='FR.svg', label_bar='C2'),
+languages = (ProgressSkill(label='Französisch', progress=100, icon_name='FR.svg', label_bar='C2'),
              ProgressSkill(label='Englisch', progress=100, icon_name='GB.svg', label_bar='C1'),
              ProgressSkill(label='Deutsch', progress=90, icon_name='DE.svg', label_bar='C1'),
              ProgressSkill(label='Italienisch', progress=80, icon_name='IT.svg', label_bar='B2'),
              ProgressSkill(label='Ukrainisch', progress=60, icon_name='UA.svg', label_bar='B1'),
-             ProgressSkill(label='Russisch', progress=60, icon_name='RU.png', label_bar='B1')]
+             ProgressSkill(label='Russisch', progress=60, icon_name='RU.png', label_bar='B1'))
 
-programming_languages = [ProgressSkill(label='Python', progress=95, icon_name='python.png'),
+programming_languages = (ProgressSkill(label='Python', progress=95, icon_name='python.png'),
                          ProgressSkill(label='SQL', progress=60, icon_name="postgresql.svg"),
                          ProgressSkill(label='Bash', progress=15, icon_name='bash.png'),
-                         ProgressSkill(label='Java', progress=10, icon_name='java.png')]
+                         ProgressSkill(label='Java', progress=10, icon_name='java.png'))
 
-tools = [ProgressSkill(label='Jupyter Lab', progress=90, icon_name='jupyterlab.png'),
+tools = (ProgressSkill(label='Jupyter Lab', progress=90, icon_name='jupyterlab.png'),
          ProgressSkill(label='Odoo', progress=85, icon_name='odoo-square.png'),
          ProgressSkill(label='Tableau', progress=85, icon_name='tableau.png'),
          ProgressSkill(label='Excel', progress=60, icon_name='excel.png'),
          ProgressSkill(label='AWS', progress=25, icon_name='aws.png'),
-         ProgressSkill(label='Docker', progress=10, icon_name='docker.png')]
+         ProgressSkill(label='Docker', progress=10, icon_name='docker.png'))
 
-markup_languages = [ProgressSkill(label='Markdown', progress=90, icon_name="markdown.png"),
-                    ProgressSkill(label='HTML|CSS', progress=20, icon_name="html_css.png")]
+markup_languages = (ProgressSkill(label='Markdown', progress=90, icon_name="markdown.png"),
+                    ProgressSkill(label='HTML|CSS', progress=20, icon_name="html_css.png"))
 
 # endregion Progress skills
 
 # region Core skills
 
 data_wrangling = TextSkill(title='Datenverarbeitung in Python',
-                           items=['<b>Tabellentransformierung</b> mit '
+                           items=('<b>Tabellentransformierung</b> mit '
                                   '<a href="https://pandas.pydata.org/">pandas</a>',
 
                                   '<b>SQL</b> Modellierung und Workflows mit '
                                   '<a href="https://www.sqlalchemy.org/">sqlalchemy</a>',
 
                                   'Mit vielen <b>verschiedenen Datenquellen</b> arbeiten '
-                                  '(SQL, REST und SOAP API, Excel, CSV, ...)'])
+                                  '(SQL, REST und SOAP API, Excel, CSV, ...)'))
 
 library_dev = TextSkill(title='Entwicklung von Bibliotheken und Scripte',
-                        items=['<b>Testing</b> mit <a href="https://docs.pytest.org/">pytest</a> '
+                        items=('<b>Testing</b> mit <a href="https://docs.pytest.org/">pytest</a> '
                                '(inkl. coverage und doctest)',
 
                                '<b>Dokumentation</b> (numpydoc guide style, GitHub Wiki)',
 
-                               '<b>Maintenance</b> (Commits, Tags, Releases, Issues, PR,...)'])
+                               '<b>Maintenance</b> (Commits, Tags, Releases, Issues, PR,...)'))
 
 data_viz = TextSkill(title='Datenvisualisierung',
-                     items=['Gestaltung von <b>komplexen <a href="https://www.tableau.com/">Tableau</a> '
-                            'Dashboards</b> mit Hilfe von <b>Python</b> und <b>SQL</b>'])
+                     items=('Gestaltung von <b>komplexen <a href="https://www.tableau.com/">Tableau</a> '
+                            'Dashboards</b> mit Hilfe von <b>Python</b> und <b>SQL</b>',))
 
 webscraping = TextSkill(title='Webscraping',
-                        items=['Automatische <b>Navigation und Datenextrahierung</b> auf Internetseiten '
-                               'mit Tools wie <a href="https://playwright.dev/">Microsoft Playwright</a>'])
+                        items=('Automatische <b>Navigation und Datenextrahierung</b> auf Internetseiten '
+                               'mit Tools wie <a href="https://playwright.dev/">Microsoft Playwright</a>',))
 
 # endregion Core skills
 
 # region Soft skills
 
-soft_skills = [TextSkill(title='Softskills',
-                         items=['Eigeninitiative',
+soft_skills = (TextSkill(title='Softskills',
+                         items=('Eigeninitiative',
                                 'Zuverlässigkeit',
                                 'Teamplayer und soziale Kompetenzen im Umgang mit verschiedenen Gesprächspartnern',
                                 'Arbeitspraxis im internationalen Umfeld',
-                                'Sehr gute schriftliche und mündliche Kommunikationsfähigkeit'])]
+                                'Sehr gute schriftliche und mündliche Kommunikationsfähigkeit')),)
 
 # endregion Soft skills
 
@@ -202,12 +278,12 @@ soft_skills = [TextSkill(title='Softskills',
 
 # region Jobs
 
-jobs = [Experience(title='Senior Python Software Developer',
+jobs = (Experience(title='Senior Python Software Developer',
                    name='JobRad GmbH',
                    date_range='08.2022 - jetzt',
                    location='Freiburg-im-Breisgau',
                    icon_name='JobRad.png',
-                   items=['Entwicklung und Integration eines maßgeschneiderten und <b>funktionsreichen '
+                   items=('Entwicklung und Integration eines maßgeschneiderten und <b>funktionsreichen '
                           'Ereignissystems</b> für JobRad, inklusive nahtloser Anbindung an externe Systeme '
                           'wie APIs und Salesforce',
 
@@ -218,13 +294,13 @@ jobs = [Experience(title='Senior Python Software Developer',
                           'Entwicklungsmeetings zur Steigerung der Projektqualität',
 
                           'Einsatz für <b>Clean Code</b> durch fortlaufendes <b>Refactoring</b>, ausführliche '
-                          '<b>Dokumentation</b> und Einführung von Code-Analyse-Tools wie SonarQube']),
+                          '<b>Dokumentation</b> und Einführung von Code-Analyse-Tools wie SonarQube')),
         Experience(title='Data Analyst',
                    name='port-neo GmbH',
                    date_range='01.2018 - 07.2022',
                    location='Freiburg-im-Breisgau',
                    icon_name='port_neo_wx60.png',
-                   items=['Erfassung, Aufbereitung und Export von Marketing- und Controllingdaten aus diversen '
+                   items=('Erfassung, Aufbereitung und Export von Marketing- und Controllingdaten aus diversen '
                           'Quellen wie Newsletterdaten, CRM und APIs',
 
                           '<b>Entwicklung und Pflege von über 30 Python-Bibliotheken</b> zur Lösung spezifischer '
@@ -235,153 +311,376 @@ jobs = [Experience(title='Senior Python Software Developer',
                           'und systemd</b>, um Effizienz und Zuverlässigkeit zu steigern',
 
                           '<b>Design von Marketing-Dashboards mit Tableau</b>, spezialisiert auf Newsletter- und '
-                          'personenbezogenen Daten, zur Unterstützung datengetriebener Entscheidungen']),
+                          'personenbezogenen Daten, zur Unterstützung datengetriebener Entscheidungen')),
         Experience(title='Junior Online Marketing Manager (befristet)',
                    name='TANDEM Kommunikation GmbH',
                    date_range='06.2017 – 11.2017',
                    location='Freiburg-im-Breisgau',
                    icon_name='tandem_wx60.png',
-                   items=['Implementierung von Tools wie <b>Google Analytics</b> und Tag Manager auf <b>über 25 '
+                   items=('Implementierung von Tools wie <b>Google Analytics</b> und Tag Manager auf <b>über 25 '
                           'Websites</b> um Website Daten zu erheben',
 
-                          'Häufige Arbeit mit Daten von <b>AdWords</b> um Konten zu optimieren, teilweise mit Python']),
+                          'Häufige Arbeit mit Daten von <b>AdWords</b> um Konten zu optimieren, teilweise mit Python')),
         Experience(title='Junior Account Manager Online Marketing (befristet)',
                    name='exito GmbH & Co. KG',
                    date_range='08.2016 – 12.2016',
                    location='Nürnberg',
                    icon_name='exito_wx60.png',
-                   items=['Entwicklung und Analyse von <b>SEA-Kundenkampagnen</b> auf Französisch und Italienisch, '
+                   items=('Entwicklung und Analyse von <b>SEA-Kundenkampagnen</b> auf Französisch und Italienisch, '
                           'inkl. Berichterstattung für Kunden',
 
                           'Gestaltung bzw. Auswahl von <b>Anzeigentexten</b>, <b>Keywords</b> und <b>Landing Pages</b>',
 
                           'Verantwortung für <b>Budgetmanagement</b> und -optimierung der Kampagnen, orientiert an '
-                          '<b>Performancezielen</b>'])]
+                          '<b>Performancezielen</b>')))
 
-jobs_page_2 = [Experience(title='Projektmanager (befristet)',
+jobs_page_2 = (Experience(title='Projektmanager (befristet)',
                           name='Arbeit und Leben NRW',
                           date_range='05.2015 – 04.2016',
                           location='Düsseldorf',
                           icon_name='aulnrw_wx60.png',
-                          items=['<b>Organisation</b> und <b>Begleitung</b> von <b>10 Begegnungen</b> zwischen '
+                          items=('<b>Organisation</b> und <b>Begleitung</b> von <b>10 Begegnungen</b> zwischen '
                                  '<b>deutschen und französischen</b> Auszubildenden',
 
                                  '<b>Leitung vor Ort</b> von einigen dieser Begegnungen und Ausbildung „interkultureller '
                                  'Jugendleiter“',
 
                                  'Mitwirkung beim Aufbau von <b>Partnerschaften</b> zwischen Arbeit und Leben NRW und '
-                                 'verschiedenen berufsbildenden sowie sozialpolitisch engagierten Organisationen'])]
+                                 'verschiedenen berufsbildenden sowie sozialpolitisch engagierten Organisationen')),)
 
 # endregion Jobs
 
 # region Studies
 
-studies = [Experience(title='Fachausbildung in Online-Handel und Online Marketing',
+studies = (Experience(title='Fachausbildung in Online-Handel und Online Marketing',
                       name='Hochschule Conservatoire National des Arts et Métiers - 5 Zertifikate',
                       date_range='10.2014 – 04.2016',
                       location='Paris, Frankreich (Fernunterricht)',
-                      items=['E-Werbung und Kommunikation',
+                      items=('E-Werbung und Kommunikation',
                              'E-Handel',
                              'Sammlung und Verarbeitung von E-Marketing Daten',
                              'Entscheidende Statistiken in Marketing',
-                             'Elektronische Marketing – Digital Marketing']),
+                             'Elektronische Marketing – Digital Marketing')),
            Experience(title='Doppel-Master of Arts „Internationale Wirtschaftsbeziehungen“',
                       name='Albert-Ludwigs-Universität Freiburg',
                       date_range='10. 2012 - 09. 2014', location='Freiburg-im-Breisgau',
-                      items=['Masterarbeit „Das legislative Umfeld des Bio-Sektors“ (Sept. 2014, 77 S. auf Deutsch)']),
+                      items=('Masterarbeit „Das legislative Umfeld des Bio-Sektors“ (Sept. 2014, 77 S. auf Deutsch)',)),
            Experience(title='Doppel-Master of Arts „Commerce et Affaires internationales“ (International Business)',
                       name='Université Paris Est Créteil (UPEC)', date_range='10. 2012 - 09. 2014',
                       location='Créteil, Frankreich',
-                      items=['Bericht „Qualität und Ausbildung“ als Vorbereitung auf ein '
-                             'Praktikum beim Dialoge Sprachinstitut (Sept. 2013, 35 S. auf Französisch)']),
+                      items=('Bericht „Qualität und Ausbildung“ als Vorbereitung auf ein '
+                             'Praktikum beim Dialoge Sprachinstitut (Sept. 2013, 35 S. auf Französisch)',)),
            Experience(title='Viersprachiger Bachelor of Arts „Internationaler Handel“',
                       name='Université Paris Est Créteil (UPEC)',
-                      date_range='10.2009 - 08.2012', location='Créteil, Frankreich', items=[]),
+                      date_range='10.2009 - 08.2012', location='Créteil, Frankreich', items=()),
            Experience(title='Baccalauréat (Sciences de l’Ingénieur) = Abitur (Ingenieurwissenschaften)',
                       name='Lycée d’Arsonval',
-                      date_range='10.2009 - 08.2012', location='Saint Maur des Fossés, Frankreich', items=[])]
+                      date_range='10.2009 - 08.2012', location='Saint Maur des Fossés, Frankreich', items=()))
 
 # endregion Studies
 
 # region Internships
 
-internships = [Experience(title='Assistent der Schulleitung',
+internships = (Experience(title='Assistent der Schulleitung',
                           name='Dialoge Sprachinstitut GmbH, Master Praktikum',
                           date_range='09. 2013 – 01.2014',
                           location='Lindau',
-                          items=['Kundenbetreuung und Marketing',
+                          items=('Kundenbetreuung und Marketing',
                                  'Wettbewerbsanalyse und Suche nach potenziellen Kunden',
                                  '<b>Qualitätsmanagement</b>: Datenverarbeitung und Erstellung von Dokumenten für die '
-                                 'ISO 9001 Akkreditierung']),
+                                 'ISO 9001 Akkreditierung')),
                Experience(title='Assistent des Teams Insolvenzverwalterbetreuung',
                           name='HSBC Trinkaus & Burkhardt AG Firmenkunden Bereich, Bachelor Praktikum',
                           date_range='05.2012 – 08.2012',
                           location='Düsseldorf',
-                          items=['Einblick in die Richtlinien der Eigenkapitalunterlegung, Insolvenzgeldfinanzierung '
+                          items=('Einblick in die Richtlinien der Eigenkapitalunterlegung, Insolvenzgeldfinanzierung '
                                  'und Treuhandkontenverwaltung',
 
                                  'Unterstützung des Teams “Insolvenzverwalterbetreuung” bei Treuhandkonteneröffnung '
-                                 'und Terminkontrolle von Insolvenzverfahren Abfrage von neuen Insolvenzverfahren'])]
+                                 'und Terminkontrolle von Insolvenzverfahren Abfrage von neuen Insolvenzverfahren')))
 
 # endregion Internships
 
 # region Holiday jobs
 
-holiday_jobs = [Experience(title='Assistent Back Office',
+holiday_jobs = (Experience(title='Assistent Back Office',
                            name='HSBC Business Banking',
                            date_range='08.2011',
                            location='Saint-Maur-des-Fossés, Frankreich',
-                           items=['Hilfe bei der Vorbereitung den finanziellen Dokumenten im Rahmen von '
-                                  'Ausschreibungen.']),
+                           items=('Hilfe bei der Vorbereitung den finanziellen Dokumenten im Rahmen von '
+                                  'Ausschreibungen.',)),
                 Experience(title='Assistent Back Office',
                            name='Société Générale',
                            date_range='08.2010',
                            location='Sucy-en-Brie, Frankreich',
-                           items=['Archivierung von Dokumenten, Kontenschließung und -Eröffnung und Überprüfung '
-                                  'von Kundendaten.'])]
+                           items=('Archivierung von Dokumenten, Kontenschließung und -Eröffnung und Überprüfung '
+                                  'von Kundendaten.',)))
 
 # endregion Holiday jobs
 
 
-# create the app
-app = Flask(__name__)
-app.jinja_env.auto_reload = True
-app.config['TEMPLATES_AUTO_RELOAD'] = True
+# region App
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# data for the template (constant so we only build it once)
+_BASE_CONTEXT = MappingProxyType(dict(encoded_email=ENCODED_EMAIL,
+                                      # 1. top page
+                                      # core skills
+                                      data_wrangling=data_wrangling,
+                                      library_dev=library_dev,
+                                      data_viz=data_viz,
+                                      webscraping=webscraping,
+                                      # progress skills
+                                      languages=languages,
+                                      programming_languages=programming_languages,
+                                      tools=tools,
+                                      markup_languages=markup_languages,
+                                      # soft skills
+                                      soft_skills=soft_skills,
+                                      # 2. bottom page
+                                      jobs=jobs,
+                                      jobs_page_2=jobs_page_2,
+                                      internships=internships,
+                                      studies=studies,
+                                      holiday_jobs=holiday_jobs))
+
+# one year, see function `add_static_cache_headers`
+STATIC_MAX_AGE = 31536000
+STATIC_VERSION = get_static_version(os.path.join(APP_DIR, 'static'))
+
+# the resume contains absolute URLs built from the "Host" header (see function `get_rendered_pages`).
+# It is only cached (and compressed) for these hosts (exact values of the header) so that clients
+# can't make us render and compress it again and again by making up hosts. They can be changed
+# with the environment variable `CACHED_HOSTS` (comma separated)
+CACHED_HOSTS = frozenset(os.environ.get('CACHED_HOSTS', 'thibaultbetremieux.pythonanywhere.com,'
+                                                        'localhost:5000,127.0.0.1:5000').split(','))
+
+# the resume only changes on deploys (data of this script, templates or static files)
+# so browsers can revalidate it with an ETag or its modification date, see function `index`
+_templates_dir = os.path.join(APP_DIR, 'templates')
+_resume_sources = [os.path.abspath(__file__)] + [f for f in iter_extra_files([_templates_dir], extensions=('.html',))
+                                                 if f != _templates_dir]
+RESUME_ETAG = hashlib.md5(repr((tuple(_BASE_CONTEXT.items()), STATIC_VERSION)).encode() +
+                          b''.join(Path(f).read_bytes() for f in _resume_sources)).hexdigest()
+# (the static version is included since the URLs of the static files in the page contain it)
+RESUME_LAST_MODIFIED = datetime.datetime.fromtimestamp(max(int(STATIC_VERSION),
+                                                           *(int(os.path.getmtime(f)) for f in _resume_sources)),
+                                                       tz=datetime.timezone.utc)
+
+
+def wipe_template_cache():
+    # When you import jinja2 macros, they get cached which is annoying for local
+    # development, so wipe the cache every request (only registered in debug mode).
+    current_app.jinja_env.cache = {}
 
 
-@app.before_request
-def before_request():
-    # When you import jinja2 macros, they get cached which is annoying for local
-    # development, so wipe the cache every request.
-    if 'localhost' in request.host_url or '0.0.0.0' in request.host_url:
-        app.jinja_env.cache = {}
+def add_static_cache_bust(endpoint: str, values: dict) -> None:
+    # trick to bust caching of static files (the version only changes on deploys so
+    # browsers can keep them in cache in the meantime)
+    if endpoint == 'static':
+        values.setdefault('cache_bust', STATIC_VERSION)
+
+
+def get_static_cache_control(query_string: str) -> str:
+    """
+    Returns the Cache-Control header for a static file given the query string of its URL.
+    URLs with a version (see function `add_static_cache_bust`) change when the files are modified
+    so browsers don't even need to revalidate them. Other URLs (e.g. hard-coded links) must
+    always be revalidated.
+
+    Examples
+    --------
+    >>> get_static_cache_control('cache_bust=1710106929')
+    'public, max-age=31536000, immutable'
+    >>> get_static_cache_control('')
+    'no-cache'
+    """
+    if 'cache_bust' in parse_qs(query_string):
+        return f'public, max-age={STATIC_MAX_AGE}, immutable'
+    return 'no-cache'
+
+
+def add_static_cache_headers(response: Response) -> Response:
+    # errors such as 404 must not be cached
+    if request.endpoint == 'static' and response.status_code in (200, 206, 304):
+        response.headers['Cache-Control'] = get_static_cache_control(request.query_string.decode('latin-1'))
+    return response
+
+
+def add_whitenoise_cache_headers(wsgi_app: Callable) -> Callable:
+    """
+    Wraps the WSGI application `wsgi_app` (WhiteNoise) so that the static files it serves get
+    the same Cache-Control header as the ones served by flask (see function `add_static_cache_headers`).
+    WhiteNoise can only decide this per file and not per URL.
+    """
+    def wrapper(environ: dict, start_response: Callable):
+        if not environ.get('PATH_INFO', '').startswith('/static/'):
+            return wsgi_app(environ, start_response)
+
+        def start_static_response(status: str, headers: list, *args):
+            if status[:3] in ('200', '206', '304'):
+                headers = [(name, value) for name, value in headers if name.lower() != 'cache-control']
+                headers.append(('Cache-Control', get_static_cache_control(environ.get('QUERY_STRING', ''))))
+            return start_response(status, headers, *args)
+
+        return wsgi_app(environ, start_static_response)
+
+    return wrapper
 
 
-@app.route('/')
 def index():
-    return render_template('index.html',
-                           encoded_email=ENCODED_EMAIL,
-                           # trick to bust CSS caching (we'll use that as a param for the URL)
-                           cache_bust=str(int(datetime.datetime.now().timestamp())),
-                           # 1. top page
-                           # core skills
-                           data_wrangling=data_wrangling,
-                           library_dev=library_dev,
-                           data_viz=data_viz,
-                           webscraping=webscraping,
-                           # progress skills
-                           languages=languages,
-                           programming_languages=programming_languages,
-                           tools=tools,
-                           markup_languages=markup_languages,
-                           # soft skills
-                           soft_skills=soft_skills,
-                           # 2. bottom page
-                           jobs=jobs,
-                           jobs_page_2=jobs_page_2,
-                           internships=internships,
-                           studies=studies,
-                           holiday_jobs=holiday_jobs)
+    # in debug mode the templates may change at any time
+    conditional = not current_app.debug
+    if conditional and not is_resource_modified(request.environ, etag=RESUME_ETAG,
+                                                last_modified=RESUME_LAST_MODIFIED):
+        # the browser already has the current version, no need to render anything
+        response = Response(status=304)
+    else:
+        body, encoding = get_page()
+        # the body is ready to be sent as is (Content-Length is set from it)
+        response = current_app.response_class(body, mimetype='text/html', direct_passthrough=True)
+        if encoding != 'identity':
+            response.content_encoding = encoding
+        response.headers['Link'] = get_preload_header(request.script_root)
+    if conditional:
+        # weak because the same ETag is used for all content encodings
+        response.set_etag(RESUME_ETAG, weak=True)
+        response.last_modified = RESUME_LAST_MODIFIED
+        response.cache_control.no_cache = True  # always revalidate (cheap thanks to the ETag)
+        response.vary.add('Accept-Encoding')
+    return response
+
+
+def get_page() -> tuple[bytes, str]:
+    """
+    Returns the resume (bytes) and its content encoding (best one the browser accepts)
+    """
+    if current_app.debug or request.host not in CACHED_HOSTS:
+        return render_page().encode(), 'identity'
+
+    pages = get_rendered_pages(request.url_root)
+    encoding = request.accept_encodings.best_match(pages, default='identity')
+    return pages[encoding], encoding
+
+
+# no eviction needed: the URL roots only vary with the hosts in `CACHED_HOSTS`, the URL scheme and
+# the script root which are all under our control (an LRU cache would miss on every request when
+# clients cycle through more hosts than its size)
+@functools.cache
+def get_rendered_pages(url_root: str) -> dict[str, bytes]:
+    """
+    Renders and compresses the resume for given URL root of the current request (the page
+    contains absolute URLs e.g. for link previews). The data does not change while the app
+    is running so this is cached (only for the hosts in `CACHED_HOSTS`, see function `get_page`).
+    """
+    return compress_page(render_page().encode())
+
+
+@functools.lru_cache(maxsize=16)
+def get_preload_header(script_root: str) -> str:
+    """
+    Returns a "Link" header telling browsers to preload the icons of the side panel
+    (they can then fetch them before having parsed the whole page) for given script
+    root of the current request.
+    """
+    skills = (*programming_languages, *tools, *markup_languages, *languages)
+    return ', '.join(f'<{url_for("static", filename="icons/" + skill.icon_name)}>; rel=preload; as=image'
+                     for skill in skills)
+
+
+def compress_page(page: bytes) -> dict[str, bytes]:
+    """
+    Compresses a page with all the content encodings we support, sorted by preference.
+    This is only done once per page so we can use the best (slowest) compression levels.
+
+    Examples
+    --------
+    >>> pages = compress_page(b'<html></html>')
+    >>> gzip.decompress(pages['gzip'])
+    b'<html></html>'
+    >>> pages['identity']
+    b'<html></html>'
+    """
+    pages = {}
+    if brotli is not None:
+        pages['br'] = brotli.compress(page, quality=11)
+    pages['gzip'] = gzip.compress(page, compresslevel=9)
+    pages['identity'] = page
+    return pages
+
+
+def render_page() -> str:
+    return render_template('index.html', **_BASE_CONTEXT)
+
+
+def precompile_templates(app: Flask) -> None:
+    """
+    Compiles the Jinja2 templates of given app to Python modules and makes the app
+    load them from there so templates never get parsed when rendering.
+
+    We use a new temporary folder for each process so that multiple workers of
+    a WSGI server don't overwrite each other's modules.
+    """
+    target = tempfile.mkdtemp(prefix='resume_templates_')
+    atexit.register(shutil.rmtree, target, ignore_errors=True)
+    app.jinja_env.compile_templates(target, zip=None, ignore_errors=False)
+    app.jinja_env.loader = ModuleLoader(target)
+
+
+def create_app(debug: bool = False) -> Flask:
+    """
+    Creates the web application of my resume. This is what WSGI servers
+    should use e.g. `gunicorn -w 4 'app:create_app()'`
+
+    When the optional library `whitenoise` is installed and we are not
+    in debug mode, the files in /static are served by WhiteNoise
+    (far-future caching headers, no roundtrip through flask).
+    Ideally a reverse proxy (e.g. nginx) serves them instead, see README.
+
+    When the environment variable `PRECOMPILE_TEMPLATES` is set to "1" and we
+    are not in debug mode, the templates are compiled to Python modules on startup
+    (see function `precompile_templates`). Otherwise the bytecode of the compiled
+    templates is cached in a private folder of the current user (see `FileSystemBytecodeCache`).
+
+    Parameters
+    ----------
+    debug
+        Whether the app is used for local development
+    """
+    app = Flask(__name__)
+    app.debug = debug
+    # reloading templates means stat calls for every render, only do that for local development
+    if debug:
+        app.jinja_env.auto_reload = True
+        app.config['TEMPLATES_AUTO_RELOAD'] = True
+        app.before_request(wipe_template_cache)
+    app.url_defaults(add_static_cache_bust)
+    app.add_url_rule('/', view_func=index)
+    if not debug:
+        app.after_request(add_static_cache_headers)
+        if os.environ.get('PRECOMPILE_TEMPLATES') == '1':
+            precompile_templates(app)
+        else:
+            # keep the compiled templates on disk so that new processes (restarts, workers)
+            # don't have to parse them again (entries are invalidated when a template changes)
+            # (without a directory jinja uses a private folder of the current user in the temporary
+            # folder of the system, a shared folder would let other users inject template code)
+            app.jinja_env.bytecode_cache = FileSystemBytecodeCache()
+        if WhiteNoise is not None:
+            # (no max_age, the header is set by our wrapper)
+            app.wsgi_app = add_whitenoise_cache_headers(WhiteNoise(app.wsgi_app, root=app.static_folder,
+                                                                   prefix='static/', max_age=None))
+    return app
+
+
+# the app imported by the WSGI configuration of pythonanywhere (production settings
+# unless the environment variable FLASK_DEBUG is set). When running this script the
+# app is created below instead (building it twice would e.g. compile the templates twice)
+if __name__ != '__main__':
+    app = create_app(debug=get_debug_flag())
+
+# endregion App
 
 
 # Start the App
@@ -393,5 +692,15 @@ if __name__ == '__main__':
     parser.add_argument('--debug', action='store_true')
     args = parser.parse_args()
 
-    # run the app
-    app.run(debug=args.debug, extra_files=get_extra_files(['./templates', './static']))
+    # outside of development, hand over to gunicorn if it is installed (it uses sendfile for the
+    # static files and several workers), see also README for using a reverse proxy.
+    # We keep the address of the dev server of flask
+    if not args.debug and shutil.which('gunicorn') is not None:
+        os.execvp('gunicorn', ['gunicorn', '-w', str(os.cpu_count() or 1), '-k', 'gthread', '--threads', '4',
+                               '--bind', '127.0.0.1:5000', '--chdir', APP_DIR, 'app:app'])
+
+    # run the app with the dev server of flask
+    app = create_app(debug=args.debug)
+    # only the templates need to be watched (static files are not cached in debug mode). The reloader
+    # of werkzeug uses events instead of polling when the library `watchdog` is installed
+    app.run(debug=args.debug, extra_files=iter_extra_files(['./templates'], extensions=('.html',)))
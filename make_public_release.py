@@ -2,10 +2,13 @@ from __future__ import annotations
 import fire
 import os
 import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from loguru import logger
-from pathlib import Path
+from pathlib import Path, PurePath
 from plumbum import local
-from typing import Iterator
+from typing import Collection, Iterator
 
 
 def switch_folder(source_folder: str | Path, destination_folder: str | Path,
@@ -49,8 +52,11 @@ class Exclusions:
     resume.
     """
     folders = ('.git', '.ipynb_checkpoints', '.vs', '.virtual_documents', '.idea', '.mypy_cache', '__pycache__')
-    exts = ('insyncdl',)
+    exts = ('insyncdl', '.gz', '.br')  # precompressed static files are generated on the server
     filenames: tuple[str, ...] = tuple()  # I needed that before, I'll just leave it here
+    # sets for fast lookups
+    _folders = frozenset(folders)
+    _filenames = frozenset(filenames)
 
     @staticmethod
     def matches(filepath: str, /) -> bool:
@@ -66,18 +72,129 @@ class Exclusions:
         >>> Exclusions.matches('/foo/.vs')
         True
         """
-        return (any(c in Path(filepath).parts for c in Exclusions.folders) or
-                any(Path(filepath).name.endswith(c) for c in Exclusions.exts) or
-                Path(filepath).name in Exclusions.filenames)
+        path = PurePath(filepath)
+        return not Exclusions._folders.isdisjoint(path.parts) or Exclusions.matches_name(path.name)
 
+    @staticmethod
+    def matches_name(name: str, /) -> bool:
+        """
+        Checks if given file name (without folders, see also function
+        `list_release_files`) is to be excluded from the public release.
+        Files named like an excluded folder are excluded as well (e.g. the
+        file .git of a git worktree or submodule)
+
+        Examples
+        --------
+        >>> Exclusions.matches_name('foo.css.gz')
+        True
+        >>> Exclusions.matches_name('.git')
+        True
+        >>> Exclusions.matches_name('app.py')
+        False
+        """
+        return (name.endswith(Exclusions.exts) or name in Exclusions._filenames
+                or name in Exclusions._folders)
 
-def recursive_listdir(folder: str | Path, /) -> Iterator[str]:
+
+def recursive_listdir(folder: str | Path, /, exclude_folders: Collection[str] = ()) -> Iterator[str]:
     """
     Recursive directory listing (files only and with full filepath)
+
+    Folders whose name is in `exclude_folders` are not explored at all.
+    """
+    # the root is resolved once, paths built from it are then absolute as well
+    to_scan = [str(Path(folder).resolve())]
+    while to_scan:
+        with os.scandir(to_scan.pop()) as entries:
+            for entry in entries:
+                # like os.walk, don't follow symlinks to directories
+                if entry.is_dir():
+                    if not entry.is_symlink() and entry.name not in exclude_folders:
+                        to_scan.append(entry.path)
+                else:
+                    yield entry.path
+
+
+def list_release_files(folder: str | Path, /) -> list[str]:
+    """
+    Lists the files of given folder that are part of the public release (see class `Exclusions`).
+    Excluded folders are skipped while walking so we only need to check the file names.
+    """
+    return [fp for fp in recursive_listdir(folder, exclude_folders=Exclusions._folders)
+            if not Exclusions.matches_name(os.path.basename(fp))]
+
+
+def is_minifiable(filepath: str, /) -> bool:
+    """
+    Checks if given filepath is a CSS or JavaScript file that is not minified yet
+
+    Examples
+    --------
+    >>> is_minifiable('/foo/static/css/index.css')
+    True
+    >>> is_minifiable('/foo/static/css/bootstrap_v5_1_3.min.css')
+    False
+    >>> is_minifiable('/foo/app.py')
+    False
+    """
+    return filepath.endswith(('.css', '.js')) and not filepath.endswith(('.min.css', '.min.js'))
+
+
+def minify_file(src: str | Path, dst: str | Path) -> None:
+    """
+    Writes a minified version (without comments and unnecessary whitespace)
+    of the CSS or JavaScript file `src` to `dst`.
+    """
+    # optional dependencies, only needed when minifying
+    import rcssmin
+    import rjsmin
+
+    minify = rcssmin.cssmin if str(src).endswith('.css') else rjsmin.jsmin
+    content = Path(src).read_text(encoding='utf-8')
+    Path(dst).write_text(minify(content), encoding='utf-8')
+
+
+def copy_file(src: str, dst: str, minify: bool = False) -> bool:
+    """
+    Copies a file for the public release (see function `main` for `minify`) unless
+    the destination is already up to date. Returns True if the file was copied.
+
+    Copies get the modification time of their source so we can tell if they are up to date
+    by comparing modification times and sizes (minified copies must be smaller instead).
     """
-    for path, _, files in os.walk(folder):
-        for name in files:
-            yield str(Path(os.path.join(path, name)).resolve())
+    minify = minify and is_minifiable(src)
+    src_stat = os.stat(src)
+    try:
+        dst_stat = os.stat(dst)
+    except FileNotFoundError:
+        pass
+    else:
+        same_content_size = dst_stat.st_size < src_stat.st_size if minify else dst_stat.st_size == src_stat.st_size
+        if dst_stat.st_mtime_ns == src_stat.st_mtime_ns and same_content_size:
+            return False
+
+    logger.debug('Adding/replacing "{}"', dst)
+    if minify:
+        minify_file(src=src, dst=dst)
+    else:
+        shutil.copyfile(src=src, dst=dst)
+    os.utime(dst, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
+    return True
+
+
+def rsync_release_files(source_folder: str | Path, destination_folder: str | Path) -> None:
+    """
+    Mirrors the files of the public release (see class `Exclusions`) from `source_folder`
+    to `destination_folder` using rsync (skips unchanged files and deletes files that are
+    no longer in the release in one pass). Excluded files in the destination such as
+    the folder .git are left untouched.
+    """
+    # no trailing slash so that files named like these folders (e.g. .git of a worktree) are also protected
+    excludes = [f'--exclude={folder}' for folder in Exclusions.folders]
+    excludes += [f'--exclude=*{ext}' for ext in Exclusions.exts]
+    excludes += [f'--exclude={filename}' for filename in Exclusions.filenames]
+    # trailing slashes so that the content of the folders is synchronized (and not the folders themselves)
+    local['rsync']['-a', '--delete', *excludes, f'{source_folder}/', f'{destination_folder}/']()
 
 
 def git_push_no_history(git_folder: str | Path, default_branch: str, commit_msg: str = 'autocommit') -> None:
@@ -89,18 +206,61 @@ def git_push_no_history(git_folder: str | Path, default_branch: str, commit_msg:
     # get git command
     git = local['git']
 
-    # see https://stackoverflow.com/a/13102849
+    # build the only commit from the index with plumbing commands instead of creating, deleting and
+    # renaming an orphan branch (see https://stackoverflow.com/a/13102849 for the porcelain way)
+    branch_ref = f'refs/heads/{default_branch}'
     with local.cwd(git_folder):
-        git['checkout', '--orphan', 'newBranch']()
-        git['add', '-A']()  # Add all files and commit them
-        git['commit', '-m', commit_msg, '--allow-empty']()
-        git['branch', '-D', default_branch]()  # Deletes the default branch
-        git['branch', '-m', default_branch]()  # Rename the current branch to default branch
+        git['symbolic-ref', 'HEAD', branch_ref]()  # make sure we are on the default branch
+        git['add', '-A']()  # Add all files
+        tree = git['write-tree']().strip()
+        commit = git['commit-tree', tree, '-m', commit_msg]().strip()  # commit without any parent
+        git['update-ref', branch_ref, commit]()  # Replace the history of the default branch
         git['push', '-f', 'origin', default_branch]()  # Force push default branch to github
-        git['gc', '--aggressive', '--prune=all']()     # remove the old files
+        git['gc', '--prune=now', '--quiet']()  # remove the old files (no need for --aggressive with one commit)
 
 
-def main(source: str = '.', destination: str = '../resume_public', default_branch: str = 'main') -> None:
+def copy_release_files(source_folder: Path, destination_folder: Path, minify: bool = False) -> None:
+    """
+    Copies the files of the public release (see class `Exclusions`) from `source_folder`
+    to `destination_folder` and deletes files that are no longer in the release
+    (see function `main` for the parameter `minify`).
+    """
+    # find files to copy
+    to_copy = list_release_files(source_folder)
+
+    # find paths to delete
+    # 1) find all existing paths in destination folder
+    # 2) switch folder of paths in `to_copy`
+    # 3) compare 1 and 2 to determine what needs to be deleted
+    destination_paths = list_release_files(destination_folder)
+    # (normalized and in a set for fast lookups)
+    new_paths = {os.path.normcase(switch_folder(source_folder=source_folder, destination_folder=destination_folder,
+                                                filepath=fp))
+                 for fp in to_copy}
+    to_delete = [p for p in destination_paths if os.path.normcase(p) not in new_paths]
+
+    # delete files
+    for filepath in to_delete:
+        logger.debug('Removing "{}"', filepath)
+        os.remove(filepath)
+
+    # copy files. We create the folders first and then copy the files in parallel
+    # (this is mostly waiting for I/O)
+    new_paths_by_source = {fp: switch_folder(source_folder=source_folder, destination_folder=destination_folder,
+                                             filepath=fp)
+                           for fp in to_copy}
+    for folder in {Path(new_path).parent for new_path in new_paths_by_source.values()}:
+        folder.mkdir(parents=True, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+        # consuming the iterator also raises exceptions of the threads
+        copied = sum(executor.map(partial(copy_file, minify=minify), new_paths_by_source.keys(),
+                                  new_paths_by_source.values()))
+    logger.info(f'Removed {len(to_delete)} file(s), added/replaced {copied} file(s) '
+                f'({len(to_copy) - copied} already up to date)')
+
+
+def main(source: str = '.', destination: str = '../resume_public', default_branch: str = 'main',
+         minify: bool = False, rsync: bool = False) -> None:
     """
     Makes a public release of my resume at https://github.com/ThibTrip/resume_public
 
@@ -116,6 +276,12 @@ def main(source: str = '.', destination: str = '../resume_public', default_branc
         Location of the public repository `resume_public` on disk
     default_branch
         Default branch of the `resume_public` repo
+    minify
+        Whether to minify CSS and JavaScript files (except already minified ones i.e. `*.min.css`
+        and `*.min.js`) in the public release. This requires the libraries rcssmin and rjsmin
+    rsync
+        Whether to synchronize the files with the command `rsync` (it must be on the PATH e.g.
+        on Linux) instead of Python. Cannot be used together with `minify`
     """
 
     # make sure we don't overwrite our folder!
@@ -123,29 +289,12 @@ def main(source: str = '.', destination: str = '../resume_public', default_branc
     destination_folder = Path(destination).resolve()
     assert source_folder != destination_folder, f'Same path for source and destination: "{source}"!'
 
-    # find files to copy
-    to_copy = [fp for fp in recursive_listdir(source_folder) if not Exclusions.matches(fp)]
-
-    # find paths to delete
-    # 1) find all existing paths in destination folder
-    # 2) switch folder of paths in `to_copy`
-    # 3) compare 1 and 2 to determine what needs to be deleted
-    destination_paths = [fp for fp in recursive_listdir(destination_folder) if not Exclusions.matches(fp)]
-    new_paths = [switch_folder(source_folder=source, destination_folder=destination, filepath=fp)
-                 for fp in to_copy]
-    to_delete = [p for p in destination_paths if p not in new_paths]
-
-    # delete files
-    for filepath in to_delete:
-        logger.info(f'Removing "{filepath}"')
-        os.remove(filepath)
-
-    # copy files
-    for filepath in to_copy:
-        new_path = switch_folder(source_folder=source_folder, destination_folder=destination_folder, filepath=filepath,
-                                 create_destination_dirs=True)
-        logger.info(f'Adding/replacing "{new_path}"')
-        shutil.copy2(src=filepath, dst=new_path)
+    if rsync:
+        assert not minify, 'Files cannot be minified when using rsync'
+        logger.info('Synchronizing files with rsync')
+        rsync_release_files(source_folder=source_folder, destination_folder=destination_folder)
+    else:
+        copy_release_files(source_folder=source_folder, destination_folder=destination_folder, minify=minify)
 
     # git push
     logger.info('Pushing to GitHub')
@@ -156,4 +305,7 @@ def main(source: str = '.', destination: str = '../resume_public', default_branc
 # # Run main function in CLI
 
 if __name__ == '__main__':
+    # only show a summary by default (use the environment variable LOGURU_LEVEL=DEBUG to see every file)
+    logger.remove()
+    logger.add(sys.stderr, level=os.environ.get('LOGURU_LEVEL', 'INFO'))
     fire.Fire(main)
@@ -0,0 +1,7 @@
+// Decodes the email addresses encoded with base64 (see variable `ENCODED_EMAIL` in app.py)
+// so that they are not readable by spam bots in the HTML
+document.querySelectorAll('[data-email]').forEach(function (element) {
+    var email = atob(element.dataset.email);
+    element.href = 'mailto:' + email;
+    element.textContent = email;
+});